@@ -3,6 +3,11 @@
 # where the 'spark' object is automatically available
 # Lint warnings about 'spark' not being defined can be ignored
 
+from functools import reduce
+
+from pyspark.sql import DataFrame # type: ignore
+from pyspark.sql import functions as F # type: ignore
+
 rif_catalog = 'extracts'
 rif_database = 'rif2025'
 
@@ -14,6 +19,10 @@ columns_to_find = [
     'owng_prvdr_tin_num'
 ]
 
+# The final display is an on-screen preview of the top TINs by cnt_bene_id only;
+# it is intentionally truncated to this many rows. The full list is the PUF_TIN_LIST table.
+display_row_limit = 1000
+
 class TINProcessor:
     """
     This class processes TIN (Tax Identification Number) data from VRDC to create VTINs.
@@ -42,28 +51,40 @@ class TINProcessor:
         return result.collect()
     
     @staticmethod
-    def _build_union_query(*, matching_records, rif_catalog, rif_database):
+    def _build_union_dataframe(*, matching_records, rif_catalog, rif_database, is_just_print):
         """
-        Build a UNION ALL query from all tables that contain TIN columns.
+        Build a DataFrame that unions all tables that contain TIN columns.
         Each table contributes: tin_column AS tin, bene_id, clm_id
+        Building the union from DataFrames lets Catalyst push the projection and
+        the NOT NULL filter into each table scan independently.
+        When just printing, each union member is printed but no table is touched and None is returned.
         """
+        if not matching_records:
+            raise ValueError("No matching tables found with TIN columns")
+        
         union_parts = []
         
         for record in matching_records:
             table_name = record['table_name']
             column_name = record['column_name']
             
-            select_part = f"""
+            print(f"""
             SELECT {column_name} AS tin, bene_id, clm_id 
             FROM {rif_catalog}.{rif_database}.{table_name}
             WHERE {column_name} IS NOT NULL
-            """
+            """)
+            if is_just_print:
+                continue
+            
+            table_df = spark.table(f"{rif_catalog}.{rif_database}.{table_name}")  # type: ignore
+            select_part = table_df.where(F.col(column_name).isNotNull()) \
+                                  .select(F.col(column_name).alias('tin'), 'bene_id', 'clm_id')
             union_parts.append(select_part)
         
-        if not union_parts:
-            raise ValueError("No matching tables found with TIN columns")
+        if is_just_print:
+            return None
         
-        return " UNION ALL ".join(union_parts)
+        return reduce(DataFrame.unionByName, union_parts)
     
     
     @staticmethod
@@ -84,45 +105,50 @@ class TINProcessor:
         
         print(f"Found {len(matching_records)} table-column combinations with TIN data")
         
-        # Step 2: Build and execute union query
-        union_query = TINProcessor._build_union_query(
+        # Step 2: Build union DataFrame and register it as a temporary view
+        print("\nCreate temporary view temp_tin_records from UNION ALL of these TIN tables:\n")
+        union_df = TINProcessor._build_union_dataframe(
             matching_records=matching_records,
             rif_catalog=rif_catalog,
-            rif_database=rif_database
+            rif_database=rif_database,
+            is_just_print=is_just_print
         )
         
-        # Step 3: Create SQL statements using f-strings directly
-        temp_view_sql = f"""
-        CREATE OR REPLACE TEMPORARY VIEW temp_tin_records AS
-        {union_query}
-        """
+        if(is_just_print):
+            print("Just printing for now\n")
+        else:
+            print("Running:\n")
+            union_df.createOrReplaceTempView("temp_tin_records")
         
+        # Step 3: Create SQL statements using f-strings directly
+        # X_TIN_LIST is no longer produced; drop any copy left by earlier runs since
+        # it holds unfiltered per-TIN counts, including small cells
         drop_x_tin_sql = f"""
         DROP TABLE IF EXISTS {output_catalog}.{output_database}.X_TIN_LIST
         """
         
-        summary_sql = f"""
-        CREATE TABLE {output_catalog}.{output_database}.X_TIN_LIST AS
-        SELECT 
-            tin,
-            COUNT(DISTINCT bene_id) AS cnt_bene_id,
-            COUNT(DISTINCT clm_id) AS cnt_clm_id
-        FROM temp_tin_records
-        GROUP BY tin
-        """
-        
         drop_puf_tin_sql = f"""
         DROP TABLE IF EXISTS {output_catalog}.{output_database}.PUF_TIN_LIST
         """
         
+        # The per-TIN aggregation and the privacy filter run as one plan, so the
+        # unfiltered counts are never written out as an intermediate table
         puf_sql = f"""
         CREATE TABLE {output_catalog}.{output_database}.PUF_TIN_LIST AS
+        WITH x_tin_list AS (
+            SELECT 
+                tin,
+                COUNT(DISTINCT bene_id) AS cnt_bene_id,
+                COUNT(DISTINCT clm_id) AS cnt_clm_id
+            FROM temp_tin_records
+            GROUP BY tin
+        )
         SELECT 
             tin, 
             '                    ' AS vtin,
             cnt_bene_id,
             cnt_clm_id
-        FROM {output_catalog}.{output_database}.X_TIN_LIST 
+        FROM x_tin_list 
         WHERE cnt_bene_id > 10
         AND tin != '000000000'
         """
@@ -131,15 +157,14 @@ class TINProcessor:
         SELECT * 
         FROM {output_catalog}.{output_database}.PUF_TIN_LIST
         ORDER BY cnt_bene_id DESC
+        LIMIT {display_row_limit}
         """
         
         # Execute all SQL commands in sequence
         sql_dict = {
-            "Create temporary view from union of all TIN tables": temp_view_sql,
             "Drop X_TIN_LIST table if exists": drop_x_tin_sql,
-            "Create X_TIN_LIST table with aggregated counts": summary_sql,
             "Drop PUF_TIN_LIST table if exists": drop_puf_tin_sql,
-            "Create PUF_TIN_LIST table with privacy filtering": puf_sql
+            "Create PUF_TIN_LIST table with aggregated counts and privacy filtering": puf_sql
         }
         
         for description, sql in sql_dict.items():
@@ -152,7 +177,8 @@ class TINProcessor:
                 spark.sql(sql)  # type: ignore
         
         # Step 4: Display results using Databricks display function
-        print(f"\nDisplaying final PUF TIN list:")
+        print(f"\nDisplaying top {display_row_limit} rows of final PUF TIN list "
+              f"(full list is in {output_catalog}.{output_database}.PUF_TIN_LIST):")
         print(display_sql)
         result_df = spark.sql(display_sql)  # type: ignore
         display(result_df)  # type: ignore
@@ -3,6 +3,7 @@
 # Load all TINs from PUF_TIN_LIST into a DataFrame, process VTINs in-memory, and create a new table PUF_VTIN_LIST
 # spark.sql is already in scope, no need to import it.
 
+import pandas as pd # type: ignore
 from pyspark.sql import functions as F # type: ignore
 from pyspark.sql.types import StringType # type: ignore
 
@@ -22,7 +23,9 @@ class VTINProcessor:
     @staticmethod
     def _create_vtin_udf(*, main_key, main_modulus):
         """
-        Create a User Defined Function (UDF) that generates VTINs for TINs.
+        Create a vectorized pandas User Defined Function (UDF) that generates VTINs for TINs.
+        Spark hands the UDF whole Arrow batches of TINs, so the JVM <-> Python crossing
+        happens once per batch instead of once per row.
         Returns a UDF that can be used in DataFrame operations.
         """
         def generate_vtin(tin_value):
@@ -30,7 +33,7 @@ class VTINProcessor:
             Generate a VTIN identifier for a given TIN using the VEIN class.
             Returns the generated VTIN string or None if generation fails.
             """
-            if tin_value is None:
+            if pd.isna(tin_value):
                 return None
             
             try:
@@ -39,13 +42,23 @@ class VTINProcessor:
                     main_key=main_key,
                     modulus=main_modulus
                 )
-                return vtin_identifier
+                # Match F.udf(..., StringType()), which stringified any returned object;
+                # Arrow would otherwise fail the whole batch on a non-str value
+                if vtin_identifier is None:
+                    return None
+                return str(vtin_identifier)
             except Exception as e:
                 print(f"Error generating VTIN for TIN {tin_value}: {str(e)}")
                 return None
         
-        # Register the UDF with Spark
-        return F.udf(generate_vtin, StringType())
+        def generate_vtins(tins: pd.Series) -> pd.Series:
+            """
+            Generate VTINs for one Arrow batch of TINs.
+            """
+            return tins.map(generate_vtin)
+        
+        # Register the pandas UDF with Spark
+        return F.pandas_udf(generate_vtins, StringType())
     
     @staticmethod
     def _load_tin_dataframe(*, output_catalog, output_database):
@@ -56,15 +69,12 @@ class VTINProcessor:
         select_sql = f"""
         SELECT tin, vtin, cnt_bene_id, cnt_clm_id
         FROM {output_catalog}.{output_database}.PUF_TIN_LIST
-        ORDER BY tin
         """
         
         print("Loading TIN records from PUF_TIN_LIST into DataFrame...")
         print(select_sql)
         
         df = spark.sql(select_sql)  # type: ignore
-        record_count = df.count()
-        print(f"Loaded {record_count} TIN records into DataFrame")
         
         return df
     
@@ -80,6 +90,12 @@ class VTINProcessor:
             main_modulus=main_modulus
         )
         
+        # PUF_TIN_LIST is small on disk and may be read into only a few partitions,
+        # so spread the rows out before the Python work to keep every executor busy.
+        # The partition count comes from spark.sql.shuffle.partitions / AQE.
+        print("Repartitioning TINs by tin...")
+        tin_df = tin_df.repartition(F.col("tin"))
+        
         print("Generating VTINs for all TINs in DataFrame...")
         # Replace the vtin column with generated VTINs
         processed_df = tin_df.withColumn("vtin", vtin_udf(F.col("tin")))
@@ -92,7 +108,9 @@ class VTINProcessor:
     @staticmethod
     def _create_vtin_table(*, processed_df, output_catalog, output_database, is_just_print):
         """
-        Create the new PUF_VTIN_LIST table with processed VTIN data.
+        Populate the PUF_VTIN_LIST table with processed VTIN data.
+        The table is created once with an explicit schema and then overwritten in place,
+        so Delta keeps its log and skips schema inference on every run.
         """
         table_name = f"{output_catalog}.{output_database}.PUF_VTIN_LIST"
         
@@ -101,20 +119,27 @@ class VTINProcessor:
             print("Sample of processed data:")
             processed_df.show(10)
         else:
-            print(f"Creating table: {table_name}")
+            print(f"Populating table: {table_name}")
             
-            # Drop the table if it exists
-            drop_sql = f"DROP TABLE IF EXISTS {table_name}"
-            print(f"Executing: {drop_sql}")
-            spark.sql(drop_sql)  # type: ignore
+            # Create the table if it does not exist yet
+            create_sql = f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                tin STRING,
+                vtin STRING,
+                cnt_bene_id BIGINT,
+                cnt_clm_id BIGINT
+            ) USING delta
+            """
+            print(f"Executing: {create_sql}")
+            spark.sql(create_sql)  # type: ignore
             
-            # Create the new table
-            processed_df.write \
+            # Overwrite the table contents; insertInto matches columns by position
+            processed_df.select("tin", "vtin", "cnt_bene_id", "cnt_clm_id") \
+                .write \
                 .mode("overwrite") \
-                .option("overwriteSchema", "true") \
-                .saveAsTable(table_name)
+                .insertInto(table_name)
             
-            print(f"Successfully created table: {table_name}")
+            print(f"Successfully populated table: {table_name}")
     
     @staticmethod
     def _display_sample_results(*, output_catalog, output_database, sample_size=10):
@@ -136,16 +161,28 @@ class VTINProcessor:
         display(result_df)  # type: ignore
     
     @staticmethod
-    def _get_processing_statistics(*, processed_df, output_catalog, output_database, is_just_print):
+    def _count_vtins(*, processed_df):
         """
-        Get statistics on the VTIN processing results.
+        Count total records and successfully generated VTINs in a single aggregation pass.
+        Returns a (total_records, non_null_vtins) tuple.
+        """
+        print("\nCounting processed VTINs...")
+        
+        stats = processed_df.agg(
+            F.count("*").alias("total_records"),
+            F.count("vtin").alias("non_null_vtins")
+        ).collect()[0]
+        
+        return stats["total_records"], stats["non_null_vtins"]
+    
+    @staticmethod
+    def _get_processing_statistics(*, total_records, non_null_vtins, output_catalog, output_database, is_just_print):
+        """
+        Get statistics on the VTIN processing results from pre-computed counts.
         """
         print("\nGetting processing statistics...")
         
-        # Get statistics from the processed DataFrame
-        total_records = processed_df.count()
-        non_null_vtins = processed_df.filter(F.col("vtin").isNotNull()).count()
-        null_vtins = processed_df.filter(F.col("vtin").isNull()).count()
+        null_vtins = total_records - non_null_vtins
         
         print(f"\nVTIN Processing Statistics:")
         print(f"Total records: {total_records}")
@@ -170,17 +207,22 @@ class VTINProcessor:
             result.show()
     
     @staticmethod
-    def _show_vtin_examples(*, processed_df, sample_size=5):
+    def _show_vtin_examples(*, processed_df, non_null_vtins, sample_size=5):
         """
         Show examples of TIN -> VTIN mappings for verification.
         """
+        if non_null_vtins == 0:
+            print("\nNo VTINs were generated, so there are no examples to show.")
+            return
+        
         print(f"\nShowing {sample_size} examples of TIN -> VTIN mappings:")
         
-        examples_df = processed_df.filter(F.col("vtin").isNotNull()) \
-                                 .select("tin", "vtin") \
-                                 .limit(sample_size)
+        examples = processed_df.filter(F.col("vtin").isNotNull()) \
+                               .select("tin", "vtin") \
+                               .take(sample_size)
         
-        examples_df.show(truncate=False)
+        for example in examples:
+            print(f"{example['tin']} -> {example['vtin']}")
     
     @staticmethod
     def execute_vtin_processing(*, is_just_print, main_key, main_modulus):
@@ -196,7 +238,7 @@ class VTINProcessor:
             output_database=output_database
         )
         
-        if tin_df.count() == 0:
+        if not tin_df.take(1):
             print("No TIN records found in PUF_TIN_LIST. Exiting.")
             return
         
@@ -207,8 +249,13 @@ class VTINProcessor:
             main_modulus=main_modulus
         )
         
-        # Step 3: Show examples of the processing results
-        VTINProcessor._show_vtin_examples(processed_df=processed_df)
+        # Step 3: Count results once and show examples of the processing results
+        total_records, non_null_vtins = VTINProcessor._count_vtins(processed_df=processed_df)
+        
+        VTINProcessor._show_vtin_examples(
+            processed_df=processed_df,
+            non_null_vtins=non_null_vtins
+        )
         
         # Step 4: Create the new PUF_VTIN_LIST table
         VTINProcessor._create_vtin_table(
@@ -220,7 +267,8 @@ class VTINProcessor:
         
         # Step 5: Display results and statistics
         VTINProcessor._get_processing_statistics(
-            processed_df=processed_df,
+            total_records=total_records,
+            non_null_vtins=non_null_vtins,
             output_catalog=output_catalog,
             output_database=output_database,
             is_just_print=is_just_print